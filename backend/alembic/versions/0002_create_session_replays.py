@@ -0,0 +1,34 @@
+"""create session replays
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql import func
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "session_replays",
+        sa.Column("session_id", sa.String(length=36), sa.ForeignKey("sessions.id"), primary_key=True),
+        sa.Column("frame_rate_hz", sa.Float(), nullable=False),
+        sa.Column("frame_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("sensor_keys", postgresql.JSONB(), nullable=False),
+        sa.Column("peak_kpa", postgresql.JSONB(), nullable=False),
+        sa.Column("frames", postgresql.JSONB(), nullable=False),
+        sa.Column("etag", sa.String(length=64), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("session_replays")
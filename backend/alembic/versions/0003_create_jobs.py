@@ -0,0 +1,41 @@
+"""create jobs
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import func
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.String(length=36), primary_key=True),
+        sa.Column("session_id", sa.String(length=36), sa.ForeignKey("sessions.id")),
+        sa.Column("kind", sa.String(length=60), nullable=False),
+        sa.Column("status", sa.String(length=20), server_default="queued", nullable=False),
+        sa.Column("priority", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("attempts", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("max_attempts", sa.Integer(), server_default="3", nullable=False),
+        sa.Column("last_error", sa.Text()),
+        sa.Column("run_after", sa.DateTime(timezone=True), server_default=func.now()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=func.now()),
+        sa.Column("started_at", sa.DateTime(timezone=True)),
+        sa.Column("finished_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_jobs_session_id", "jobs", ["session_id"])
+    op.create_index("ix_jobs_claim", "jobs", ["status", "priority", "run_after"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_jobs_claim", table_name="jobs")
+    op.drop_index("ix_jobs_session_id", table_name="jobs")
+    op.drop_table("jobs")
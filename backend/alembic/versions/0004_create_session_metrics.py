@@ -0,0 +1,40 @@
+"""create session metrics
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import func
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "session_metrics",
+        sa.Column("session_id", sa.String(length=36), sa.ForeignKey("sessions.id"), primary_key=True),
+        sa.Column("patient_id", sa.String(length=36), sa.ForeignKey("patients.id"), nullable=False),
+        sa.Column("physiotherapist_id", sa.String(length=36), sa.ForeignKey("physiotherapists.id"), nullable=False),
+        sa.Column("start_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("duration_seconds", sa.Float()),
+        sa.Column("sample_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("max_pressure_kpa", sa.Float(), server_default="0", nullable=False),
+        sa.Column("heel_mean_kpa", sa.Float(), server_default="0", nullable=False),
+        sa.Column("midfoot_mean_kpa", sa.Float(), server_default="0", nullable=False),
+        sa.Column("toe_mean_kpa", sa.Float(), server_default="0", nullable=False),
+        sa.Column("computed_at", sa.DateTime(timezone=True), server_default=func.now()),
+    )
+    op.create_index("ix_session_metrics_patient_start", "session_metrics", ["patient_id", "start_time"])
+    op.create_index("ix_session_metrics_physio_start", "session_metrics", ["physiotherapist_id", "start_time"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_session_metrics_physio_start", table_name="session_metrics")
+    op.drop_index("ix_session_metrics_patient_start", table_name="session_metrics")
+    op.drop_table("session_metrics")
@@ -0,0 +1,24 @@
+"""add session archive pointer
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("sessions", sa.Column("archive_uri", sa.String(length=255)))
+    op.add_column("sessions", sa.Column("archived_at", sa.DateTime(timezone=True)))
+
+
+def downgrade() -> None:
+    op.drop_column("sessions", "archived_at")
+    op.drop_column("sessions", "archive_uri")
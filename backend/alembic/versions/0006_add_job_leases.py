@@ -0,0 +1,24 @@
+"""add job leases
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("jobs", sa.Column("worker_id", sa.String(length=120)))
+    op.add_column("jobs", sa.Column("lease_expires_at", sa.DateTime(timezone=True)))
+
+
+def downgrade() -> None:
+    op.drop_column("jobs", "lease_expires_at")
+    op.drop_column("jobs", "worker_id")
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import distinct, func, select
+from sqlalchemy.orm import Session
+
+from db import SessionLocal
+from job_queue import enqueue_job
+from models import Job, Patient, Session as DbSession, SessionMetrics
+from session_store import REGION_METRIC_COLUMNS, summarize_session
+
+ANALYTICS_CACHE_TTL_SECONDS = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "60"))
+ANALYTICS_CACHE_MAX_ENTRIES = 256
+
+METRIC_COLUMNS = {
+    "heel_mean_kpa": SessionMetrics.heel_mean_kpa,
+    "midfoot_mean_kpa": SessionMetrics.midfoot_mean_kpa,
+    "toe_mean_kpa": SessionMetrics.toe_mean_kpa,
+    "max_pressure_kpa": SessionMetrics.max_pressure_kpa,
+    "duration_seconds": SessionMetrics.duration_seconds,
+    "sample_count": SessionMetrics.sample_count,
+}
+
+_cache: Dict[Tuple, Tuple[float, Dict]] = {}
+_cache_lock = threading.Lock()
+
+
+def _get_db() -> Session:
+    return SessionLocal()
+
+
+def compute_session_metrics(session_id: str) -> Dict:
+    """Grava (ou atualiza) a linha de session_metrics de uma sessao finalizada."""
+    db = _get_db()
+    try:
+        session = db.get(DbSession, session_id)
+        if not session:
+            raise ValueError("Sessão não encontrada")
+        if session.end_time is None:
+            raise ValueError("Sessão ainda está em andamento")
+        summary = summarize_session(session)
+
+        metrics = db.get(SessionMetrics, session_id)
+        if metrics is None:
+            metrics = SessionMetrics(session_id=session_id)
+            db.add(metrics)
+        metrics.patient_id = session.patient_id
+        metrics.physiotherapist_id = session.physiotherapist_id
+        metrics.start_time = session.start_time
+        metrics.duration_seconds = summary["duration_seconds"]
+        metrics.sample_count = summary["sample_count"]
+        metrics.max_pressure_kpa = summary["max_pressure_kpa"]
+        for region, column in REGION_METRIC_COLUMNS.items():
+            setattr(metrics, column, summary["region_averages"].get(region, 0.0))
+        metrics.computed_at = datetime.utcnow()
+        db.commit()
+        return {"session_id": session_id, **{column: getattr(metrics, column) for column in METRIC_COLUMNS}}
+    finally:
+        db.close()
+
+
+def enqueue_missing_metrics() -> int:
+    """Enfileira compute_metrics para sessoes finalizadas que ainda nao tem metricas nem job pendente."""
+    db = _get_db()
+    try:
+        pending = select(Job.session_id).where(
+            Job.kind == "compute_metrics", Job.status.in_(["queued", "running"])
+        )
+        session_ids = db.execute(
+            select(DbSession.id)
+            .outerjoin(SessionMetrics, SessionMetrics.session_id == DbSession.id)
+            .where(
+                DbSession.end_time.is_not(None),
+                SessionMetrics.session_id.is_(None),
+                DbSession.id.not_in(pending),
+            )
+        ).scalars().all()
+        for session_id in session_ids:
+            enqueue_job(db, "compute_metrics", session_id=session_id)
+        db.commit()
+        return len(session_ids)
+    finally:
+        db.close()
+
+
+def query_session_metrics(
+    metric: str,
+    *,
+    physiotherapist_id: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    age_min: Optional[int] = None,
+    age_max: Optional[int] = None,
+    ordinal: Optional[str] = None,
+) -> Dict:
+    """Agrega uma metrica sobre as sessoes que passam nos filtros, em uma unica consulta SQL.
+
+    `ordinal` seleciona a sessao do paciente pela ordem cronologica: "first" (admissao),
+    "last" (alta mais recente) ou um numero a partir de 1, contados sobre todas as sessoes
+    encerradas do paciente. Sessoes ainda sem metricas nao entram nas agregacoes e sao
+    reportadas em `missing_metrics`.
+    """
+    if metric not in METRIC_COLUMNS:
+        raise ValueError(f"Métrica inválida. Opções: {', '.join(METRIC_COLUMNS)}")
+    if start_date and end_date and start_date > end_date:
+        raise ValueError("Data inicial deve ser anterior à data final")
+    if age_min is not None and age_max is not None and age_min > age_max:
+        raise ValueError("Faixa etária inválida")
+    ordinal_filter = _parse_ordinal(ordinal)
+
+    key = (metric, physiotherapist_id, start_date, end_date, age_min, age_max, ordinal_filter)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    db = _get_db()
+    try:
+        # Numera todas as sessoes encerradas de cada paciente antes de qualquer filtro, para que
+        # "first"/"last" reflitam o historico completo mesmo com troca de fisioterapeuta.
+        ranked = (
+            select(
+                DbSession.id.label("session_id"),
+                DbSession.patient_id,
+                DbSession.physiotherapist_id,
+                DbSession.start_time,
+                func.row_number()
+                .over(partition_by=DbSession.patient_id, order_by=DbSession.start_time)
+                .label("ordinal"),
+                func.row_number()
+                .over(partition_by=DbSession.patient_id, order_by=DbSession.start_time.desc())
+                .label("reverse_ordinal"),
+            )
+            .where(DbSession.end_time.is_not(None))
+            .subquery()
+        )
+
+        conditions = []
+        if physiotherapist_id:
+            conditions.append(ranked.c.physiotherapist_id == physiotherapist_id)
+        if age_min is not None:
+            conditions.append(Patient.age >= age_min)
+        if age_max is not None:
+            conditions.append(Patient.age <= age_max)
+        if start_date:
+            conditions.append(ranked.c.start_time >= datetime.combine(start_date, dt_time.min))
+        if end_date:
+            conditions.append(ranked.c.start_time < datetime.combine(end_date + timedelta(days=1), dt_time.min))
+        if ordinal_filter == "last":
+            conditions.append(ranked.c.reverse_ordinal == 1)
+        elif ordinal_filter is not None:
+            conditions.append(ranked.c.ordinal == ordinal_filter)
+
+        # Sessoes sem linha em session_metrics (job pendente ou com falha) mantem sua posicao no
+        # ordinal, ficam fora das agregacoes e sao contadas em `missing_metrics`.
+        value = METRIC_COLUMNS[metric]
+        row = db.execute(
+            select(
+                func.count(SessionMetrics.session_id),
+                func.count(ranked.c.session_id) - func.count(SessionMetrics.session_id),
+                func.count(distinct(SessionMetrics.patient_id)),
+                func.avg(value),
+                func.stddev_samp(value),
+                func.min(value),
+                func.max(value),
+            )
+            .select_from(ranked)
+            .join(Patient, Patient.id == ranked.c.patient_id)
+            .outerjoin(SessionMetrics, SessionMetrics.session_id == ranked.c.session_id)
+            .where(*conditions)
+        ).one()
+    finally:
+        db.close()
+
+    session_count, missing_metrics, patient_count, mean, stddev, minimum, maximum = row
+    result = {
+        "metric": metric,
+        "filters": {
+            "physiotherapist_id": physiotherapist_id,
+            "start_date": start_date.isoformat() if start_date else None,
+            "end_date": end_date.isoformat() if end_date else None,
+            "age_min": age_min,
+            "age_max": age_max,
+            "ordinal": ordinal_filter,
+        },
+        "session_count": session_count,
+        "missing_metrics": missing_metrics,
+        "patient_count": patient_count,
+        "mean": _round(mean),
+        "stddev": _round(stddev),
+        "min": _round(minimum),
+        "max": _round(maximum),
+    }
+    _cache_put(key, result)
+    return result
+
+
+def _parse_ordinal(value: Optional[str]):
+    if value is None or value == "":
+        return None
+    if value == "first":
+        return 1
+    if value == "last":
+        return "last"
+    if value.isdigit() and int(value) >= 1:
+        return int(value)
+    raise ValueError("Ordinal inválido. Use 'first', 'last' ou um número a partir de 1")
+
+
+def _round(value) -> Optional[float]:
+    return round(float(value), 2) if value is not None else None
+
+
+def _cache_get(key: Tuple) -> Optional[Dict]:
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del _cache[key]
+            return None
+        return value
+
+
+def _cache_put(key: Tuple, value: Dict) -> None:
+    with _cache_lock:
+        if len(_cache) >= ANALYTICS_CACHE_MAX_ENTRIES:
+            _cache.pop(next(iter(_cache)))
+        _cache[key] = (time.monotonic() + ANALYTICS_CACHE_TTL_SECONDS, value)
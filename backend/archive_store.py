@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple, Optional, Protocol, Tuple
+from urllib.parse import unquote, urlparse
+from uuid import uuid4
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from db import SessionLocal
+from job_queue import JobDeferred, enqueue_job
+from models import Job, PressureSample, Session as DbSession, SessionMetrics
+
+ARCHIVE_BACKEND = os.getenv("ARCHIVE_BACKEND", "local").lower()
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", Path(__file__).resolve().parent / "archive"))
+ARCHIVE_S3_BUCKET = os.getenv("ARCHIVE_S3_BUCKET")
+ARCHIVE_S3_ENDPOINT_URL = os.getenv("ARCHIVE_S3_ENDPOINT_URL")
+ARCHIVE_CACHE_SIZE = int(os.getenv("ARCHIVE_CACHE_SIZE", "16"))
+
+
+class ArchivedSample(NamedTuple):
+    timestamp: datetime
+    pressures: Optional[dict]
+
+
+class _ArchiveStore(Protocol):
+    def put(self, key: str, data: bytes) -> str: ...
+    def get(self, uri: str) -> bytes: ...
+
+
+class _LocalArchiveStore:
+    def __init__(self, root: Path) -> None:
+        self._root = root
+
+    def put(self, key: str, data: bytes) -> str:
+        path = self._root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f"{path.suffix}.{uuid4().hex}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        # Ponteiro relativo a ARCHIVE_DIR, para continuar valido se o diretorio mudar de lugar.
+        return f"local:{key}"
+
+    def get(self, uri: str) -> bytes:
+        parsed = urlparse(uri)
+        if parsed.scheme == "file":
+            return Path(unquote(parsed.path)).read_bytes()
+        return (self._root / parsed.path).read_bytes()
+
+
+class _S3ArchiveStore:
+    def __init__(self, bucket: Optional[str]) -> None:
+        if not bucket:
+            raise RuntimeError("ARCHIVE_S3_BUCKET nao configurado para arquivamento em S3.")
+        try:
+            import boto3  # type: ignore
+        except ImportError as exc:  # pragma: no cover - import guard
+            raise RuntimeError("boto3 nao instalado. Adicione 'boto3' ao requirements e reinstale.") from exc
+        self._bucket = bucket
+        self._client = boto3.client("s3", endpoint_url=ARCHIVE_S3_ENDPOINT_URL)
+
+    def put(self, key: str, data: bytes) -> str:
+        self._client.put_object(Bucket=self._bucket, Key=key, Body=data, ContentEncoding="gzip")
+        return f"s3://{self._bucket}/{key}"
+
+    def get(self, uri: str) -> bytes:
+        parsed = urlparse(uri)
+        response = self._client.get_object(Bucket=parsed.netloc, Key=parsed.path.lstrip("/"))
+        return response["Body"].read()
+
+
+def _get_db() -> Session:
+    return SessionLocal()
+
+
+def _get_store() -> _ArchiveStore:
+    if ARCHIVE_BACKEND == "s3":
+        return _S3ArchiveStore(ARCHIVE_S3_BUCKET)
+    return _LocalArchiveStore(ARCHIVE_DIR)
+
+
+def _get_reader(uri: str) -> _ArchiveStore:
+    # O ponteiro ja diz onde o arquivo esta; nao depende do backend configurado hoje.
+    parsed = urlparse(uri)
+    if parsed.scheme == "s3":
+        return _S3ArchiveStore(parsed.netloc)
+    if parsed.scheme in {"local", "file"}:
+        return _LocalArchiveStore(ARCHIVE_DIR)
+    raise ValueError(f"Ponteiro de arquivo inválido: {uri}")
+
+
+def archive_session(session_id: str) -> Optional[str]:
+    """Move as amostras de uma sessao finalizada para um arquivo compactado e guarda o ponteiro."""
+    db = _get_db()
+    try:
+        # O lock na linha da sessao serializa jobs de arquivamento concorrentes; o segundo ve o ponteiro gravado.
+        session = db.get(DbSession, session_id, with_for_update=True)
+        if not session:
+            raise ValueError("Sessão não encontrada")
+        if session.end_time is None:
+            raise ValueError("Sessão ainda está em andamento")
+        if session.archive_uri:
+            return session.archive_uri
+
+        pending = (
+            db.query(Job)
+            .filter(
+                Job.session_id == session_id,
+                Job.kind != "archive_samples",
+                Job.status.in_(["queued", "running"]),
+            )
+            .count()
+        )
+        if pending:
+            # Replay e metricas ainda leem a tabela quente; adia sem gastar tentativa.
+            raise JobDeferred("Pós-processamento da sessão ainda pendente")
+        if db.get(SessionMetrics, session_id) is None:
+            # O resumo de sessoes arquivadas vem de session_metrics; sem ela as amostras nao saem.
+            raise ValueError("Métricas da sessão indisponíveis para arquivamento")
+
+        samples = (
+            db.query(PressureSample)
+            .filter(PressureSample.session_id == session_id)
+            .order_by(PressureSample.timestamp)
+            .all()
+        )
+        if len(samples) != (session.sample_count or 0):
+            # Leitura parcial ou vazia nunca pode substituir as linhas quentes.
+            raise ValueError(
+                f"Sessão com {len(samples)} amostras, esperado {session.sample_count}; arquivamento cancelado"
+            )
+        payload = {
+            "session_id": session_id,
+            "samples": [
+                {"timestamp": sample.timestamp.isoformat(), "pressures": sample.pressures}
+                for sample in samples
+            ],
+        }
+        data = gzip.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        uri = _get_store().put(f"sessions/{session_id}.json.gz", data)
+
+        session.archive_uri = uri
+        session.archived_at = datetime.utcnow()
+        db.query(PressureSample).filter(PressureSample.session_id == session_id).delete(synchronize_session=False)
+        db.commit()
+        return uri
+    finally:
+        db.close()
+
+
+def enqueue_archival(older_than_days: int = 0) -> int:
+    """Enfileira o arquivamento das sessoes encerradas ha pelo menos `older_than_days` dias.
+
+    Sessoes ainda sem linha em session_metrics ficam de fora ate o job compute_metrics rodar.
+    """
+    db = _get_db()
+    try:
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        pending = select(Job.session_id).where(
+            Job.kind == "archive_samples", Job.status.in_(["queued", "running"])
+        )
+        session_ids = db.execute(
+            select(DbSession.id)
+            .join(SessionMetrics, SessionMetrics.session_id == DbSession.id)
+            .where(
+                DbSession.end_time.is_not(None),
+                DbSession.end_time <= cutoff,
+                DbSession.archive_uri.is_(None),
+                DbSession.id.not_in(pending),
+            )
+        ).scalars().all()
+        for session_id in session_ids:
+            enqueue_job(db, "archive_samples", session_id=session_id)
+        db.commit()
+        return len(session_ids)
+    finally:
+        db.close()
+
+
+@lru_cache(maxsize=ARCHIVE_CACHE_SIZE)
+def load_archived_samples(uri: str) -> Tuple[ArchivedSample, ...]:
+    """Le (com cache LRU) as amostras de um arquivo de sessao."""
+    try:
+        data = _get_reader(uri).get(uri)
+        payload = json.loads(gzip.decompress(data).decode("utf-8"))
+        return tuple(
+            ArchivedSample(timestamp=datetime.fromisoformat(item["timestamp"]), pressures=item["pressures"])
+            for item in payload["samples"]
+        )
+    except Exception as exc:
+        # Arquivo ausente, corrompido ou erro do S3 (ClientError): falha com mensagem clara, sem 500 generico.
+        raise ValueError(f"Arquivo da sessão indisponível ({uri}): {exc}") from exc
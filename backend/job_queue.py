@@ -0,0 +1,333 @@
+from __future__ import annotations
+
+import importlib
+import multiprocessing
+import os
+import socket
+import threading
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from uuid import uuid4
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+from db import SessionLocal
+from models import Job
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.0"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_MAX_CRASHES = int(os.getenv("JOB_MAX_CRASHES", "3"))
+ARCHIVE_ON_END = os.getenv("ARCHIVE_ON_END", "0").lower() in {"1", "true", "yes"}
+
+# tipo do job -> "modulo:funcao"; a funcao recebe o session_id e roda no processo worker.
+JOB_HANDLERS: Dict[str, str] = {
+    "build_replay": "replay:build_replay",
+    "compute_metrics": "analytics:compute_session_metrics",
+    "archive_samples": "archive_store:archive_session",
+}
+# Jobs enfileirados ao encerrar uma sessao, como (tipo, prioridade). Maior prioridade roda antes.
+POST_SESSION_JOBS: List[Tuple[str, int]] = [
+    ("build_replay", 10),
+    ("compute_metrics", 5),
+]
+if ARCHIVE_ON_END:
+    POST_SESSION_JOBS.append(("archive_samples", 0))
+
+
+class JobDeferred(Exception):
+    """O job ainda nao pode rodar; volta para a fila sem consumir tentativa."""
+
+
+def _get_db() -> Session:
+    return SessionLocal()
+
+
+def enqueue_job(
+    db: Session,
+    kind: str,
+    *,
+    session_id: Optional[str] = None,
+    priority: int = 0,
+    max_attempts: int = 3,
+) -> Job:
+    """Adiciona um job na transacao corrente; o commit fica a cargo de quem chamou."""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Tipo de job desconhecido: {kind}")
+    job = Job(kind=kind, session_id=session_id, priority=priority, max_attempts=max_attempts)
+    db.add(job)
+    return job
+
+
+def enqueue_post_session_jobs(db: Session, session_id: str) -> List[Job]:
+    return [enqueue_job(db, kind, session_id=session_id, priority=priority) for kind, priority in POST_SESSION_JOBS]
+
+
+def list_jobs(session_id: str) -> List[Dict]:
+    db = _get_db()
+    try:
+        jobs = (
+            db.query(Job)
+            .filter(Job.session_id == session_id)
+            .order_by(Job.created_at)
+            .all()
+        )
+        return [summarize_job(job) for job in jobs]
+    finally:
+        db.close()
+
+
+def summarize_job(job: Job) -> Dict:
+    duration = None
+    if job.started_at and job.finished_at:
+        duration = round((job.finished_at - job.started_at).total_seconds(), 3)
+    return {
+        "id": job.id,
+        "session_id": job.session_id,
+        "kind": job.kind,
+        "status": job.status,
+        "priority": job.priority,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "crash_count": job.crash_count,
+        "last_error": job.last_error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "duration_seconds": duration,
+    }
+
+
+def _run_job(kind: str, session_id: Optional[str]) -> None:
+    module_name, func_name = JOB_HANDLERS[kind].split(":")
+    handler = getattr(importlib.import_module(module_name), func_name)
+    handler(session_id)
+
+
+class JobScheduler:
+    """Despacha jobs da tabela `jobs` para um pool de processos, com limite de concorrencia."""
+
+    def __init__(self, workers: int = JOB_WORKERS, poll_seconds: float = JOB_POLL_SECONDS) -> None:
+        self._workers = max(workers, 1)
+        self._poll_seconds = poll_seconds
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._running: Dict[Future, str] = {}
+        self._worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._executor = self._new_executor()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self._reap(block=True)
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # "spawn" evita herdar via fork o estado de threads do uvicorn e o pool de conexoes do pai.
+        return ProcessPoolExecutor(max_workers=self._workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _loop(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self._reap()
+                self._renew_leases()
+                self._submit(self._claim(self._workers - len(self._running)))
+            except Exception as exc:
+                print("Erro no agendador de jobs:", exc)
+            self._stop_event.wait(self._poll_seconds)
+
+    def _submit(self, claimed: List[Tuple[str, str, Optional[str]]]) -> None:
+        for index, (job_id, kind, session_id) in enumerate(claimed):
+            try:
+                future = self._executor.submit(_run_job, kind, session_id)
+            except BrokenProcessPool:
+                # Um worker morreu (OOM, segfault...) e o pool nao aceita mais tarefas: recria o pool
+                # e devolve a fila os jobs ja reservados que nao chegaram a ser enviados.
+                print("Pool de processos quebrado; recriando.")
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+                for pending_id, _kind, _session_id in claimed[index:]:
+                    self._release(pending_id)
+                return
+            self._running[future] = job_id
+
+    def _claim(self, slots: int) -> List[Tuple[str, str, Optional[str]]]:
+        if slots <= 0:
+            return []
+        db = _get_db()
+        try:
+            now = datetime.utcnow()
+            # Jobs "running" com lease vencida pertencem a um processo que caiu e podem ser retomados.
+            jobs = (
+                db.execute(
+                    select(Job)
+                    .where(
+                        or_(
+                            and_(Job.status == "queued", Job.run_after <= now),
+                            and_(
+                                Job.status == "running",
+                                or_(Job.lease_expires_at.is_(None), Job.lease_expires_at < now),
+                            ),
+                        )
+                    )
+                    .order_by(Job.priority.desc(), Job.created_at)
+                    .limit(slots)
+                    .with_for_update(skip_locked=True)
+                )
+                .scalars()
+                .all()
+            )
+            claimed = []
+            for job in jobs:
+                if job.status == "running" and (job.attempts or 0) >= job.max_attempts:
+                    # Lease vencida de um job que ja usou todas as tentativas: nao roda de novo.
+                    job.status = "failed"
+                    job.finished_at = now
+                    job.worker_id = None
+                    job.lease_expires_at = None
+                    job.last_error = "Lease expirada após esgotar as tentativas"
+                    continue
+                claimed.append(job)
+                job.status = "running"
+                job.attempts = (job.attempts or 0) + 1
+                job.started_at = now
+                job.finished_at = None
+                job.worker_id = self._worker_id
+                job.lease_expires_at = now + timedelta(seconds=JOB_LEASE_SECONDS)
+            db.commit()
+            return [(job.id, job.kind, job.session_id) for job in claimed]
+        finally:
+            db.close()
+
+    def _reap(self, block: bool = False) -> None:
+        done = [future for future in self._running if block or future.done()]
+        pool_broken = False
+        for future in done:
+            job_id = self._running.pop(future)
+            if future.cancelled():
+                self._release(job_id)
+                continue
+            try:
+                future.result()
+                error = None
+            except JobDeferred:
+                self._release(job_id, delay_seconds=JOB_RETRY_BASE_SECONDS)
+                continue
+            except BrokenProcessPool:
+                pool_broken = True
+                self._record_crash(job_id)
+                continue
+            except Exception as exc:
+                error = "".join(traceback.format_exception_only(type(exc), exc)).strip()
+            self._finish(job_id, error)
+
+        if pool_broken:
+            # Nao da para saber qual job derrubou o worker: todos os que estavam no pool perdem o
+            # processo, contam uma queda (nao uma tentativa) e o pool e recriado imediatamente.
+            for future, job_id in list(self._running.items()):
+                self._running.pop(future)
+                self._record_crash(job_id)
+            if self._executor is not None:
+                print("Pool de processos quebrado; recriando.")
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+
+    def _finish(self, job_id: str, error: Optional[str]) -> None:
+        db = _get_db()
+        try:
+            job = db.get(Job, job_id)
+            if not job or job.worker_id != self._worker_id:
+                # A lease venceu e outro processo retomou o job; o resultado dele prevalece.
+                return
+            now = datetime.utcnow()
+            job.finished_at = now
+            job.worker_id = None
+            job.lease_expires_at = None
+            job.last_error = error
+            if error is None:
+                job.status = "succeeded"
+            elif job.attempts < job.max_attempts:
+                job.status = "queued"
+                job.run_after = now + timedelta(seconds=JOB_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1))
+            else:
+                job.status = "failed"
+            db.commit()
+        finally:
+            db.close()
+
+    def _release(self, job_id: str, delay_seconds: float = 0) -> None:
+        # Job cancelado, adiado ou nao enviado ao pool: volta para a fila sem consumir tentativa.
+        db = _get_db()
+        try:
+            job = db.get(Job, job_id)
+            if job and job.status == "running" and job.worker_id == self._worker_id:
+                job.status = "queued"
+                job.attempts = max((job.attempts or 1) - 1, 0)
+                job.started_at = None
+                job.worker_id = None
+                job.lease_expires_at = None
+                job.run_after = datetime.utcnow() + timedelta(seconds=delay_seconds)
+                db.commit()
+        finally:
+            db.close()
+
+    def _record_crash(self, job_id: str) -> None:
+        db = _get_db()
+        try:
+            job = db.get(Job, job_id)
+            if not job or job.status != "running" or job.worker_id != self._worker_id:
+                return
+            now = datetime.utcnow()
+            job.crash_count = (job.crash_count or 0) + 1
+            job.attempts = max((job.attempts or 1) - 1, 0)
+            job.worker_id = None
+            job.lease_expires_at = None
+            job.last_error = "Processo worker encerrado inesperadamente"
+            if job.crash_count >= JOB_MAX_CRASHES:
+                job.status = "failed"
+                job.finished_at = now
+            else:
+                job.status = "queued"
+                job.started_at = None
+                job.run_after = now + timedelta(seconds=JOB_RETRY_BASE_SECONDS)
+            db.commit()
+        finally:
+            db.close()
+
+    def _renew_leases(self) -> None:
+        if not self._running:
+            return
+        db = _get_db()
+        try:
+            db.query(Job).filter(
+                Job.id.in_(list(self._running.values())),
+                Job.status == "running",
+                Job.worker_id == self._worker_id,
+            ).update(
+                {Job.lease_expires_at: datetime.utcnow() + timedelta(seconds=JOB_LEASE_SECONDS)},
+                synchronize_session=False,
+            )
+            db.commit()
+        finally:
+            db.close()
+
+
+scheduler = JobScheduler()
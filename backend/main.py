@@ -1,11 +1,17 @@
-from datetime import datetime
+from contextlib import asynccontextmanager
+from datetime import date, datetime
 from typing import Dict, Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 
+from analytics import enqueue_missing_metrics, query_session_metrics
 from arduino_reader import read_pressure_data
+from archive_store import enqueue_archival
+from job_queue import list_jobs, scheduler
+from replay import REPLAY_CHUNK_FRAMES, REPLAY_MAX_CHUNK_FRAMES, get_replay_chunk, get_replay_etag
 from session_store import (
     append_sample,
     create_patient,
@@ -18,7 +24,17 @@ from session_store import (
 )
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    scheduler.start()
+    try:
+        enqueue_missing_metrics()
+        yield
+    finally:
+        scheduler.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,6 +42,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 
@@ -115,3 +132,65 @@ def api_get_session(session_id: str):
         return get_session(session_id)
     except ValueError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
+
+
+@app.get("/sessions/{session_id}/jobs")
+def api_list_jobs(session_id: str):
+    return list_jobs(session_id)
+
+
+@app.get("/sessions/{session_id}/replay")
+def api_get_replay(
+    session_id: str,
+    request: Request,
+    start: int = Query(default=0, ge=0),
+    count: int = Query(default=REPLAY_CHUNK_FRAMES, ge=1, le=REPLAY_MAX_CHUNK_FRAMES),
+):
+    cache_control = "private, max-age=3600"
+    # Revalidacao responde 304 so com os metadados, sem fatiar os quadros no banco.
+    etag = get_replay_etag(session_id, start=start, count=count)
+    if etag and _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+    try:
+        chunk = get_replay_chunk(session_id, start=start, count=count)
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    return JSONResponse(content=chunk, headers={"ETag": chunk["etag"], "Cache-Control": cache_control})
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match usa comparacao fraca: ignora o prefixo W/ e aceita lista separada por virgulas ou "*".
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return any(candidate == "*" or candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+@app.get("/analytics/sessions")
+def api_session_analytics(
+    metric: str = Query(default="heel_mean_kpa"),
+    physiotherapist_id: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    age_min: Optional[int] = Query(default=None, ge=0, le=120),
+    age_max: Optional[int] = Query(default=None, ge=0, le=120),
+    ordinal: Optional[str] = None,
+):
+    try:
+        return query_session_metrics(
+            metric,
+            physiotherapist_id=physiotherapist_id,
+            start_date=start_date,
+            end_date=end_date,
+            age_min=age_min,
+            age_max=age_max,
+            ordinal=ordinal,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@app.post("/archive/sessions")
+def api_archive_sessions(older_than_days: int = Query(default=7, ge=0)):
+    return {"enqueued": enqueue_archival(older_than_days)}
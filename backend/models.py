@@ -1,7 +1,7 @@
 from datetime import datetime
 from uuid import uuid4
 
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String, Text
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -48,12 +48,17 @@ class Session(Base):
     end_time: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     sample_count: Mapped[int] = mapped_column(Integer, default=0)
     max_pressure_kpa: Mapped[float] = mapped_column(Float, default=0)
+    archive_uri: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    archived_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
     patient: Mapped[Patient] = relationship("Patient", back_populates="sessions")
     physiotherapist: Mapped[Physiotherapist] = relationship("Physiotherapist")
     samples: Mapped[list["PressureSample"]] = relationship(
         "PressureSample", back_populates="session", cascade="all, delete-orphan"
     )
+    replay: Mapped["SessionReplay | None"] = relationship(
+        "SessionReplay", back_populates="session", cascade="all, delete-orphan", uselist=False
+    )
 
 
 class PressureSample(Base):
@@ -65,3 +70,59 @@ class PressureSample(Base):
     pressures: Mapped[dict | None] = mapped_column(JSONB)
 
     session: Mapped[Session] = relationship("Session", back_populates="samples")
+
+
+class SessionReplay(Base):
+    __tablename__ = "session_replays"
+
+    session_id: Mapped[str] = mapped_column(String(36), ForeignKey("sessions.id"), primary_key=True)
+    frame_rate_hz: Mapped[float] = mapped_column(Float)
+    frame_count: Mapped[int] = mapped_column(Integer, default=0)
+    sensor_keys: Mapped[list] = mapped_column(JSONB)
+    peak_kpa: Mapped[dict] = mapped_column(JSONB)
+    frames: Mapped[list] = mapped_column(JSONB)
+    etag: Mapped[str] = mapped_column(String(64))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+
+    session: Mapped[Session] = relationship("Session", back_populates="replay")
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_claim", "status", "priority", "run_after"),)
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid)
+    session_id: Mapped[str | None] = mapped_column(String(36), ForeignKey("sessions.id"), index=True, nullable=True)
+    kind: Mapped[str] = mapped_column(String(60))
+    status: Mapped[str] = mapped_column(String(20), default="queued")
+    priority: Mapped[int] = mapped_column(Integer, default=0)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, default=3)
+    crash_count: Mapped[int] = mapped_column(Integer, default=0)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    worker_id: Mapped[str | None] = mapped_column(String(120), nullable=True)
+    lease_expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    run_after: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class SessionMetrics(Base):
+    __tablename__ = "session_metrics"
+    __table_args__ = (
+        Index("ix_session_metrics_patient_start", "patient_id", "start_time"),
+        Index("ix_session_metrics_physio_start", "physiotherapist_id", "start_time"),
+    )
+
+    session_id: Mapped[str] = mapped_column(String(36), ForeignKey("sessions.id"), primary_key=True)
+    patient_id: Mapped[str] = mapped_column(String(36), ForeignKey("patients.id"))
+    physiotherapist_id: Mapped[str] = mapped_column(String(36), ForeignKey("physiotherapists.id"))
+    start_time: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    duration_seconds: Mapped[float | None] = mapped_column(Float, nullable=True)
+    sample_count: Mapped[int] = mapped_column(Integer, default=0)
+    max_pressure_kpa: Mapped[float] = mapped_column(Float, default=0)
+    heel_mean_kpa: Mapped[float] = mapped_column(Float, default=0)
+    midfoot_mean_kpa: Mapped[float] = mapped_column(Float, default=0)
+    toe_mean_kpa: Mapped[float] = mapped_column(Float, default=0)
+    computed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from db import SessionLocal
+from models import Session as DbSession, SessionReplay
+from session_store import REGIONS, SENSOR_KEYS, _volts_to_kpa, load_session_samples
+
+# O SessionPage grava uma amostra a cada 500 ms; taxas maiores so repetiriam leituras.
+REPLAY_FRAME_HZ = float(os.getenv("REPLAY_FRAME_HZ", "2"))
+REPLAY_CHUNK_FRAMES = int(os.getenv("REPLAY_CHUNK_FRAMES", "600"))
+REPLAY_MAX_CHUNK_FRAMES = 2400
+
+# Mesmas coordenadas usadas pelo SessionPage para o centro de pressao.
+SENSOR_COORDS: Dict[str, tuple[float, float]] = {
+    "fsr0": (160, 130),
+    "fsr1": (230, 140),
+    "fsr2": (175, 210),
+    "fsr3": (240, 225),
+    "fsr4": (200, 285),
+    "fsr5": (180, 350),
+    "fsr6": (250, 350),
+}
+COP_THRESHOLD_KPA = 5.0
+
+
+def _get_db() -> Session:
+    return SessionLocal()
+
+
+def build_replay(session_id: str) -> Dict:
+    """Gera (ou regera) o artefato de replay de uma sessao finalizada."""
+    db = _get_db()
+    try:
+        session = db.get(DbSession, session_id)
+        if not session:
+            raise ValueError("Sessão não encontrada")
+        if session.end_time is None:
+            raise ValueError("Sessão ainda está em andamento")
+        _build_replay(db, session)
+        db.commit()
+        return _replay_metadata(_load_replay_metadata(db, session_id))
+    finally:
+        db.close()
+
+
+def get_replay_etag(session_id: str, start: int = 0, count: int = REPLAY_CHUNK_FRAMES) -> Optional[str]:
+    """ETag do trecho pedido, sem ler os quadros; None se o replay ainda nao foi gerado."""
+    db = _get_db()
+    try:
+        replay = _load_replay_metadata(db, session_id)
+        return _chunk_etag(replay, start, min(count, REPLAY_MAX_CHUNK_FRAMES)) if replay else None
+    finally:
+        db.close()
+
+
+def get_replay_chunk(session_id: str, start: int = 0, count: int = REPLAY_CHUNK_FRAMES) -> Dict:
+    """Retorna os quadros [start, start + count) do replay, gerando o artefato se ainda nao existir."""
+    if start < 0 or count <= 0:
+        raise ValueError("Intervalo de quadros inválido")
+    count = min(count, REPLAY_MAX_CHUNK_FRAMES)
+
+    db = _get_db()
+    try:
+        replay = _load_replay_metadata(db, session_id)
+        if replay is None:
+            session = db.get(DbSession, session_id)
+            if not session:
+                raise ValueError("Sessão não encontrada")
+            if session.end_time is None:
+                raise ValueError("Sessão ainda está em andamento")
+            _build_replay(db, session)
+            db.commit()
+            replay = _load_replay_metadata(db, session_id)
+
+        stop = min(start + count, replay.frame_count)
+        frames: List = []
+        if start < stop:
+            # Fatia o array JSONB no proprio banco para nao trafegar a sessao inteira.
+            path = literal_column(f"'$[{start} to {stop - 1}]'::jsonpath")
+            frames = db.execute(
+                select(func.jsonb_path_query_array(SessionReplay.frames, path)).where(
+                    SessionReplay.session_id == session_id
+                )
+            ).scalar_one()
+
+        result = _replay_metadata(replay)
+        result.update(
+            {
+                "start": start,
+                "frames": frames,
+                "etag": _chunk_etag(replay, start, count),
+            }
+        )
+        return result
+    finally:
+        db.close()
+
+
+def _chunk_etag(replay, start: int, count: int) -> str:
+    stop = min(start + count, replay.frame_count)
+    return f'"{replay.etag}-{start}-{stop}"'
+
+
+def _load_replay_metadata(db: Session, session_id: str):
+    return db.execute(
+        select(
+            SessionReplay.session_id,
+            SessionReplay.frame_rate_hz,
+            SessionReplay.frame_count,
+            SessionReplay.sensor_keys,
+            SessionReplay.peak_kpa,
+            SessionReplay.etag,
+        ).where(SessionReplay.session_id == session_id)
+    ).one_or_none()
+
+
+def _build_replay(db: Session, session: DbSession) -> None:
+    samples = load_session_samples(db, session)
+    frames = _resample_frames(samples, REPLAY_FRAME_HZ)
+    # Valor final do pico acumulado, sobre todas as amostras brutas (inclusive as posteriores ao ultimo quadro).
+    peak = [0.0] * len(SENSOR_KEYS)
+    for sample in samples:
+        peak = [max(current, value) for current, value in zip(peak, _sample_kpa(sample))]
+    peak_kpa = {key: round(value, 1) for key, value in zip(SENSOR_KEYS, peak)}
+    digest = hashlib.sha1(
+        json.dumps({"hz": REPLAY_FRAME_HZ, "frames": frames, "peak": peak_kpa}, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
+
+    values = {
+        "frame_rate_hz": REPLAY_FRAME_HZ,
+        "frame_count": len(frames),
+        "sensor_keys": list(SENSOR_KEYS),
+        "peak_kpa": peak_kpa,
+        "frames": frames,
+        "etag": digest,
+        "created_at": datetime.utcnow(),
+    }
+    # Upsert: o job de pos-processamento e a geracao sob demanda podem correr em paralelo.
+    db.execute(
+        pg_insert(SessionReplay)
+        .values(session_id=session.id, **values)
+        .on_conflict_do_update(index_elements=[SessionReplay.session_id], set_=values)
+    )
+
+
+def _resample_frames(samples: List, frame_hz: float) -> List[Dict]:
+    """Reamostra as leituras em taxa fixa, mantendo a ultima amostra vista em cada quadro."""
+    if not samples:
+        return []
+
+    origin = samples[0].timestamp
+    duration = (samples[-1].timestamp - origin).total_seconds()
+    frame_count = int(duration * frame_hz) + 1
+    frames: List[Dict] = []
+    cursor = 0
+    # Pico acumulado ate cada quadro, sobre todas as amostras brutas ja vistas (nao so as reamostradas).
+    peak = _sample_kpa(samples[0])
+
+    for index in range(frame_count):
+        offset = index / frame_hz
+        while cursor + 1 < len(samples) and (samples[cursor + 1].timestamp - origin).total_seconds() <= offset:
+            cursor += 1
+            peak = [max(current, value) for current, value in zip(peak, _sample_kpa(samples[cursor]))]
+        kpa = _sample_kpa(samples[cursor])
+        frames.append(
+            {
+                "t": round(offset, 3),
+                "kpa": [round(value, 1) for value in kpa],
+                "cop": _center_of_pressure(kpa),
+                "regions": _region_loads(kpa),
+                "peak": [round(value, 1) for value in peak],
+            }
+        )
+    return frames
+
+
+def _sample_kpa(sample) -> List[float]:
+    pressures: Dict[str, float] = sample.pressures or {}
+    return [_volts_to_kpa(pressures.get(key, 0.0)) for key in SENSOR_KEYS]
+
+
+def _center_of_pressure(kpa: List[float]) -> Optional[List[float]]:
+    weighted_x = weighted_y = weight = 0.0
+    for key, value in zip(SENSOR_KEYS, kpa):
+        if value > COP_THRESHOLD_KPA:
+            x, y = SENSOR_COORDS[key]
+            weighted_x += x * value
+            weighted_y += y * value
+            weight += value
+    if weight <= 0:
+        return None
+    return [round(weighted_x / weight, 1), round(weighted_y / weight, 1)]
+
+
+def _region_loads(kpa: List[float]) -> Dict[str, float]:
+    by_sensor = dict(zip(SENSOR_KEYS, kpa))
+    return {
+        region: round(sum(by_sensor[sensor] for sensor in sensors) / len(sensors), 2) if sensors else 0.0
+        for region, sensors in REGIONS.items()
+    }
+
+
+def _replay_metadata(replay) -> Dict:
+    return {
+        "session_id": replay.session_id,
+        "frame_rate_hz": replay.frame_rate_hz,
+        "frame_count": replay.frame_count,
+        "sensor_keys": replay.sensor_keys,
+        "peak_kpa": replay.peak_kpa,
+    }
@@ -5,8 +5,10 @@ from typing import Dict, List, Optional
 
 from sqlalchemy.orm import Session, object_session
 
+from archive_store import load_archived_samples
 from db import SessionLocal
-from models import Patient, Physiotherapist, PressureSample, Session as DbSession
+from job_queue import enqueue_post_session_jobs
+from models import Patient, Physiotherapist, PressureSample, Session as DbSession, SessionMetrics
 
 SENSOR_KEYS = ["fsr0", "fsr1", "fsr2", "fsr3", "fsr4", "fsr5", "fsr6"]
 REGIONS: Dict[str, List[str]] = {
@@ -14,6 +16,12 @@ REGIONS: Dict[str, List[str]] = {
     "MIDFOOT": ["fsr2", "fsr3", "fsr4"],
     "TOE": ["fsr0", "fsr1"],
 }
+# Regioes de REGIONS -> colunas de session_metrics.
+REGION_METRIC_COLUMNS: Dict[str, str] = {
+    "HEEL": "heel_mean_kpa",
+    "MIDFOOT": "midfoot_mean_kpa",
+    "TOE": "toe_mean_kpa",
+}
 DEFAULT_PHYSIO_EMAIL = "fisioterapeuta@pbl2025.com"
 DEFAULT_PHYSIO_NAME = "Fisioterapeuta PBL"
 
@@ -162,6 +170,7 @@ def end_session(session_id: str) -> Dict:
             raise ValueError("Sessão não encontrada")
         if session.end_time is None:
             session.end_time = datetime.utcnow()
+            enqueue_post_session_jobs(db, session.id)
             db.commit()
             db.refresh(session)
         return summarize_session(session)
@@ -190,12 +199,7 @@ def get_session(session_id: str) -> Dict:
         if not session:
             raise ValueError("Sessão não encontrada")
         result = summarize_session(session)
-        samples = (
-            db.query(PressureSample)
-            .filter(PressureSample.session_id == session_id)
-            .order_by(PressureSample.timestamp)
-            .all()
-        )
+        samples = load_session_samples(db, session)
         result["samples"] = [
             {
                 "timestamp": sample.timestamp.isoformat(),
@@ -209,18 +213,16 @@ def get_session(session_id: str) -> Dict:
 
 
 def summarize_session(session: DbSession) -> Dict:
+    if session.archive_uri:
+        return _summarize_archived_session(session)
+
     region_totals = {region: 0.0 for region in REGIONS}
     summary_samples: List[PressureSample] = list(getattr(session, "samples", []) or [])
 
     if not summary_samples:
         db_session = object_session(session)
         if db_session:
-            summary_samples = (
-                db_session.query(PressureSample)
-                .filter(PressureSample.session_id == session.id)
-                .order_by(PressureSample.timestamp)
-                .all()
-            )
+            summary_samples = load_session_samples(db_session, session)
 
     sample_count = session.sample_count or len(summary_samples)
 
@@ -240,6 +242,21 @@ def summarize_session(session: DbSession) -> Dict:
     else:
         region_averages = {region: 0.0 for region in REGIONS}
 
+    return _session_payload(session, sample_count, region_averages)
+
+
+def _summarize_archived_session(session: DbSession) -> Dict:
+    # As amostras ficam no arquivo; as medias por regiao vem de session_metrics, gravada antes do arquivamento.
+    db_session = object_session(session)
+    metrics = db_session.get(SessionMetrics, session.id) if db_session else None
+    region_averages = {
+        region: round(getattr(metrics, REGION_METRIC_COLUMNS[region]), 2) if metrics else 0.0
+        for region in REGIONS
+    }
+    return _session_payload(session, session.sample_count or 0, region_averages)
+
+
+def _session_payload(session: DbSession, sample_count: int, region_averages: Dict[str, float]) -> Dict:
     return {
         "id": session.id,
         "patient_id": session.patient_id,
@@ -250,9 +267,22 @@ def summarize_session(session: DbSession) -> Dict:
         "max_pressure_kpa": round(session.max_pressure_kpa or 0.0, 2),
         "duration_seconds": _duration_seconds(session.start_time, session.end_time),
         "region_averages": region_averages,
+        "archived": session.archive_uri is not None,
     }
 
 
+def load_session_samples(db: Optional[Session], session: DbSession) -> List:
+    """Amostras da sessao em ordem temporal, lidas do arquivo se a sessao ja foi arquivada."""
+    if session.archive_uri:
+        return list(load_archived_samples(session.archive_uri))
+    return (
+        db.query(PressureSample)
+        .filter(PressureSample.session_id == session.id)
+        .order_by(PressureSample.timestamp)
+        .all()
+    )
+
+
 def _duration_seconds(start: Optional[datetime], end: Optional[datetime]) -> Optional[float]:
     if not start or not end:
         return None
@@ -1,4 +1,4 @@
-import { Patient, Pressao, SessionDetail, SessionSummary } from "../types";
+import { Patient, Pressao, SessionDetail, SessionReplayChunk, SessionSummary } from "../types";
 
 const API_BASE = import.meta.env.VITE_API_URL ?? "http://127.0.0.1:8000";
 
@@ -63,6 +63,18 @@ export async function fetchSession(sessionId: string): Promise<SessionDetail> {
   return request<SessionDetail>(`/sessions/${sessionId}`);
 }
 
+export async function fetchSessionReplay(
+  sessionId: string,
+  start = 0,
+  count?: number,
+): Promise<SessionReplayChunk> {
+  const params = new URLSearchParams({ start: String(start) });
+  if (count !== undefined) {
+    params.set("count", String(count));
+  }
+  return request<SessionReplayChunk>(`/sessions/${sessionId}/replay?${params.toString()}`);
+}
+
 export async function appendSessionSample(
   sessionId: string,
   sensor_readings: Pressao,
@@ -92,6 +104,7 @@ export const api = {
   fetchSessions,
   startSession,
   fetchSession,
+  fetchSessionReplay,
   appendSessionSample,
   endSession,
   fetchPressure,
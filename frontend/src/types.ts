@@ -18,6 +18,7 @@ export interface SessionSummary {
   max_pressure_kpa: number;
   duration_seconds?: number | null;
   region_averages: Record<string, number>;
+  archived?: boolean;
 }
 
 export interface SessionDetail extends SessionSummary {
@@ -27,6 +28,25 @@ export interface SessionDetail extends SessionSummary {
   }>;
 }
 
+export interface ReplayFrame {
+  t: number;
+  kpa: number[];
+  cop: [number, number] | null;
+  regions: Record<string, number>;
+  peak: number[];
+}
+
+export interface SessionReplayChunk {
+  session_id: string;
+  frame_rate_hz: number;
+  frame_count: number;
+  sensor_keys: string[];
+  peak_kpa: Record<string, number>;
+  start: number;
+  frames: ReplayFrame[];
+  etag: string;
+}
+
 export interface AuthUser {
   email: string;
   name: string;